@@ -0,0 +1 @@
+# Raiz do repositório no sys.path, para os testes importarem `utils.*`
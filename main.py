@@ -1,30 +1,64 @@
+import argparse
 import logging
+from os.path import splitext
 from utils.logger_functions import setup_logger, _timed
-from utils.copasi_hand_shake import (
-    generate_handshake_model,
-    save_model,
-    run_simulation,
-    show_plot
-)
-from utils.PySB_hand_shake import run_stage_4_tellurium
+
+# Os módulos de cada etapa são importados só no ramo que os usa: basico,
+# tellurium e numba levam quase 1s cada para carregar
 
 logger = logging.getLogger(__name__)
 
 if __name__ == "__main__":
-    # level = input("Enter logging level INFO (ENTER) ou DEBUG (QUALQUER LETRA): ")
-    level = "DEBUG"
+    parser = argparse.ArgumentParser(description="Protocolo Two-Phase Handshake com Circuito Genético")
+    parser.add_argument("--copasi", action="store_true",
+                        help="Executa também o modelo COPASI (Etapa 3)")
+    parser.add_argument("--stochastic", type=int, nargs="?", const=1000, default=None, metavar="N",
+                        help="Executa N trajetórias Gillespie (padrão: 1000) em vez da simulação determinística")
+    parser.add_argument("--no-plot", action="store_true",
+                        help="Não constrói os gráficos (apenas simula)")
+    parser.add_argument("--save-plot", metavar="ARQUIVO", default=None,
+                        help="Salva o gráfico da Etapa 4 (ou do ensemble, com --stochastic) em arquivo em vez de exibi-lo; "
+                             "com --copasi, o gráfico do COPASI vai para ARQUIVO com o sufixo _copasi")
+    parser.add_argument("--points", type=int, default=501,
+                        help="Número de pontos de saída da simulação da Etapa 4 (padrão: 501)")
+    args = parser.parse_args()
+
     setup_logger(debug=False)
 
-    # (COPASI) Gera e salva o modelo do protocolo Two-Phase Handshake com circuito genético
-    # with _timed(logger, "(COPASI) Execução do Protocolo Two-Phase Handshake com Circuito Genético"):
-    #     generate_handshake_model()
-    #     save_model()
-    #     simulation_data = run_simulation()
-    #     logger.info("Exibindo o gráfico dos resultados da simulação.")
-    # show_plot(simulation_data)
-
-    # (Etapa 4) Executa simulação com Tellurium/Antimony
-    logger.info("\n" + "=" * 80)
-    logger.info("Iniciando Etapa 4: Simulação com Tellurium")
-    logger.info("=" * 80)
-    tellurium_data = run_stage_4_tellurium()
+    if args.copasi:
+        from utils.copasi_hand_shake import (
+            generate_handshake_model,
+            save_model,
+            run_simulation,
+            show_plot
+        )
+
+        # (COPASI) Gera e salva o modelo do protocolo Two-Phase Handshake com circuito genético
+        with _timed(logger, "(COPASI) Execução do Protocolo Two-Phase Handshake com Circuito Genético"):
+            generate_handshake_model()
+            save_model()
+            simulation_data = run_simulation()
+        if not args.no_plot:
+            if args.save_plot:
+                base, ext = splitext(args.save_plot)
+                show_plot(simulation_data, save_path=f"{base}_copasi{ext}")
+            else:
+                logger.info("Exibindo o gráfico dos resultados da simulação.")
+                show_plot(simulation_data)
+
+    if args.stochastic is not None:
+        from utils.gillespie_handshake import run_stochastic_ensemble, summarize_ensemble, show_ensemble_plot
+
+        # (Etapa 6) Ensemble estocástico do mesmo modelo da Etapa 4
+        time, trajectories = run_stochastic_ensemble(n_runs=args.stochastic)
+        ensemble_summary = summarize_ensemble(time, trajectories)
+        if not args.no_plot:
+            show_ensemble_plot(ensemble_summary, save_path=args.save_plot)
+    else:
+        from utils.PySB_hand_shake import run_stage_4_tellurium
+
+        # (Etapa 4) Executa simulação com Tellurium/Antimony
+        logger.info("\n" + "=" * 80)
+        logger.info("Iniciando Etapa 4: Simulação com Tellurium")
+        logger.info("=" * 80)
+        run_stage_4_tellurium(plot=not args.no_plot, save_path=args.save_plot, n_points=args.points)
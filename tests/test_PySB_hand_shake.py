@@ -0,0 +1,60 @@
+import subprocess
+import sys
+from os.path import dirname
+
+import numpy as np
+
+from utils import PySB_hand_shake
+from utils.PySB_hand_shake import sweep
+
+RAIZ = dirname(dirname(__file__))
+
+
+def test_sweep_aplica_parametros_de_cada_ponto():
+    """Pontos com k_ack_out_deg diferentes não podem dar a mesma trajetória."""
+    (p1, d1), (p2, d2) = sweep({'k_ack_out_deg': [5.0, 50.0]}, max_workers=2)
+
+    assert (p1['k_ack_out_deg'], p2['k_ack_out_deg']) == (5.0, 50.0)
+    assert np.abs(d1['Ack_out'].values - d2['Ack_out'].values).max() > 1e-2
+
+
+def test_cache_invalido_e_recompilado(tmp_path, monkeypatch):
+    """Um estado corrompido no cache é descartado em vez de quebrar a carga."""
+    monkeypatch.setattr(PySB_hand_shake, 'CACHE', str(tmp_path))
+    PySB_hand_shake.generate_tellurium_model()
+    (state,) = tmp_path.iterdir()
+    state.write_bytes(b'corrompido')
+
+    rr = PySB_hand_shake.generate_tellurium_model()
+
+    assert rr.integrator.stiff
+    assert PySB_hand_shake.run_tellurium_simulation(rr)['Ack_out'].notna().all()
+    assert [p.name for p in tmp_path.iterdir()] == [state.name]
+
+
+def test_k_req_alterado_no_modelo_carregado_muda_a_saida():
+    """K_req_sq acompanha K_req: alterar K_req direto no modelo tem efeito."""
+    rr = PySB_hand_shake.generate_tellurium_model()
+    nominal = PySB_hand_shake.run_tellurium_simulation(rr)
+
+    rr['K_req'] = 2.0
+    alterado = PySB_hand_shake.run_tellurium_simulation(rr)
+
+    assert rr['K_req_sq'] == 4.0
+    assert np.abs(nominal['mRNA_Ack'].values - alterado['mRNA_Ack'].values).max() > 1e-2
+
+
+
+def test_simulacao_sem_avisos_do_cvode():
+    """Os eventos de Req_in não podem colapsar o passo do CVODE (t + h == t)."""
+    # O SUNDIALS escreve direto no stdout do C, com buffer só descarregado ao
+    # sair do processo: a simulação roda num processo separado
+    codigo = (
+        "from utils.PySB_hand_shake import generate_tellurium_model, run_tellurium_simulation\n"
+        "rr = generate_tellurium_model()\n"
+        "for n_points in (101, 501, 1001):\n"
+        "    run_tellurium_simulation(rr, n_points=n_points)\n"
+    )
+    saida = subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ, capture_output=True, text=True, check=True)
+
+    assert 'CVode' not in saida.stdout + saida.stderr
@@ -0,0 +1,16 @@
+import basico
+import numpy as np
+
+from utils.copasi_hand_shake import generate_handshake_model, run_simulation
+
+
+def test_modelo_reaproveitado_volta_aos_valores_declarados():
+    """Alterações feitas no modelo ativo não sobrevivem a uma nova geração."""
+    generate_handshake_model()
+    nominal = run_simulation()
+
+    basico.set_parameters("k_req_out_deg", initial_value=1.0)
+    basico.set_species("Ack_out", initial_concentration=0.3)
+    generate_handshake_model()
+
+    np.testing.assert_allclose(run_simulation(), nominal)
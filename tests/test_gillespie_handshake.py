@@ -0,0 +1,14 @@
+import numpy as np
+
+from utils.gillespie_handshake import run_stochastic_ensemble, summarize_ensemble
+from utils.rhs_handshake import SPECIES, run_scipy_simulation
+
+
+def test_media_do_ensemble_segue_o_modelo_deterministico():
+    """Com os padrões (omega=100, 1000 trajetórias) a média fica a 0.02 da EDO."""
+    time, trajectories = run_stochastic_ensemble()
+    summary = summarize_ensemble(time, trajectories)
+    deterministico = run_scipy_simulation(n_points=len(time))
+
+    for name in SPECIES:
+        np.testing.assert_allclose(summary[f"{name}_mean"], deterministico[name], atol=0.02, err_msg=name)
@@ -0,0 +1,16 @@
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from utils.plot_functions import _get_fig
+
+
+def test_figura_reaproveitada_vira_a_atual():
+    fig_a, _ = _get_fig(4, 1, figsize=(14, 10))
+    fig_b, _ = _get_fig(5, 1, figsize=(16, 14))
+    assert plt.gcf() is fig_b
+
+    fig_a2, _ = _get_fig(4, 1, figsize=(14, 10))
+    assert fig_a2 is fig_a
+    assert plt.gcf() is fig_a
+    plt.close('all')
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from utils.PySB_hand_shake import generate_tellurium_model, run_tellurium_simulation
+from utils.rhs_handshake import PARAMS, SPECIES, f, jac, run_scipy_simulation
+
+
+def test_scipy_concorda_com_tellurium():
+    """A tradução manual de J1..J11 não pode divergir do modelo Antimony."""
+    esperado = run_tellurium_simulation(generate_tellurium_model(), n_points=1001)
+    obtido = run_scipy_simulation(n_points=1001)
+
+    np.testing.assert_allclose(obtido.index, esperado.index)
+    for coluna in SPECIES + ['Req_in']:
+        np.testing.assert_allclose(obtido[coluna], esperado[coluna], atol=1e-3, err_msg=coluna)
+
+
+@pytest.mark.parametrize("req_in", [0.0, 1.0])
+def test_jacobiana_concorda_com_diferencas_finitas(req_in):
+    p = PARAMS.copy()
+    p[0] = req_in
+    rng = np.random.default_rng(0)
+    h = 1e-6
+
+    for y in rng.uniform(0.0, 1.5, size=(5, len(SPECIES))):
+        numerica = np.empty((len(SPECIES), len(SPECIES)))
+        for j in range(len(SPECIES)):
+            dy = np.zeros(len(SPECIES))
+            dy[j] = h
+            numerica[:, j] = (f(0.0, y + dy, p) - f(0.0, y - dy, p)) / (2 * h)
+
+        np.testing.assert_allclose(jac(0.0, y, p), numerica, rtol=1e-6, atol=1e-6)
@@ -26,14 +26,32 @@ Cascata lógica:
     Proteína_Req_out ←┘ (feedback)
 """
 
+import os
+
+# Importado primeiro: escolhe o backend do matplotlib (HEADLESS) antes que o
+# tellurium ou o pyplot o carreguem
+from utils.plot_functions import _get_fig, _mark_events
+
 import tellurium as te
+import roadrunner
 import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
+import contextlib
+import hashlib
+import itertools
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from os.path import abspath, dirname, join, exists
 from utils.logger_functions import _timed_debug, _timed
+from utils.phases import PHASES, EVENT_TIMES, antimony_events
 
 logger = logging.getLogger(__name__)
 
+# Estados do RoadRunner já compilados (ver generate_tellurium_model), em
+# cache/ na raiz do repositório, qualquer que seja o diretório de trabalho
+CACHE = join(dirname(dirname(abspath(__file__))), "cache")
+
 # ==============================================================================
 # ABORDAGEM 1: Usando Tellurium com Antimony (linguagem de texto para modelos)
 # ==============================================================================
@@ -77,11 +95,12 @@ def generate_tellurium_model():
         k_mrna_ack_deg = 2.5;       // Degradação de mRNA_Ack
         k_ack_out_transl = 1.5;     // Tradução mRNA_Ack → Ack_out
         k_ack_out_deg = 25.0;       // Inibição mútua: MUITO forte para manter relação direta com Req_out
-        k_ack_out_basal = 0.5;      // Produção basal de Ack_out (reduzido)
-        k_ack_out_deg_basal = 0.5;  // Degradação basal de Ack_out
 
         K_req = 0.5;                // Threshold de Req_out para ativar mRNA_Ack
-        K_ack = 0.5;                // Threshold de Ack_out para feedback
+
+        // Denominador de Hill de J5 (regra de atribuição: acompanha K_req
+        // mesmo quando ele é alterado no modelo já carregado)
+        K_req_sq := K_req * K_req;
 
         // ===== ESPÉCIES (concentrações) =====
         var mRNA_Req, Req_out, mRNA_Ack, Ack_out;
@@ -91,11 +110,20 @@ def generate_tellurium_model():
         mRNA_Ack = 0.0;
         Ack_out = 1.0;  // Começa alto (inibidor desativado)
 
+        // ===== TERMOS DE HILL (regras de atribuição) =====
+        // Cada potência é calculada uma vez por avaliação, em vez de
+        // repetida no numerador e no denominador da lei de taxa
+        // (expoente inteiro n=2 expandido em multiplicação, sem chamar pow)
+        Req_in_h := Req_in * Req_in;
+        Req_out_h := Req_out * Req_out;
+        mRNA_Ack_h := mRNA_Ack * mRNA_Ack;
+        Ack_out_h := Ack_out * Ack_out;
+
         // ===== REAÇÕES =====
 
         // R1: Produção de mRNA_Req (ativada por Req_in, Hill n=2)
         // Taxa = k * Req_in^2 / (K^2 + Req_in^2)
-        J1: -> mRNA_Req; k_mrna_req_prod * Req_in^2 / (0.25 + Req_in^2);
+        J1: -> mRNA_Req; k_mrna_req_prod * Req_in_h / (0.25 + Req_in_h);
 
         // R2: Degradação de mRNA_Req
         J2: mRNA_Req -> ; k_mrna_req_deg * mRNA_Req;
@@ -108,7 +136,7 @@ def generate_tellurium_model():
 
         // R5: Produção de mRNA_Ack (ativada por Req_out, Hill n=2)
         // Taxa = k * Req_out^2 / (K^2 + Req_out^2)
-        J5: -> mRNA_Ack; k_mrna_ack_prod * Req_out^2 / (K_req^2 + Req_out^2);
+        J5: -> mRNA_Ack; k_mrna_ack_prod * Req_out_h / (K_req_sq + Req_out_h);
 
         // R6: Degradação de mRNA_Ack
         J6: mRNA_Ack -> ; k_mrna_ack_deg * mRNA_Ack;
@@ -123,7 +151,7 @@ def generate_tellurium_model():
         // R9: Inibição de Ack_out por mRNA_Ack (competição por recursos)
         // Quando mRNA_Ack sobe, reduz produção de Ack_out
         // Taxa = k * [mRNA_Ack^2 / (1 + mRNA_Ack^2)] (só consome, não produz)
-        J9: Ack_out -> ; 3.0 * (mRNA_Ack^2 / (1.0 + mRNA_Ack^2)) * Ack_out;
+        J9: Ack_out -> ; 3.0 * (mRNA_Ack_h / (1.0 + mRNA_Ack_h)) * Ack_out;
 
         // R10: Produção FORTE de Ack_out (sempre tenta manter em 1)
         // Produção constitutiva que domina quando mRNA_Ack e Req_out são baixos
@@ -131,187 +159,299 @@ def generate_tellurium_model():
 
         // R11: Degradação proporcional à concentração de Ack_out
         // Taxa = 5.0 * [Ack_out^2 / (1 + Ack_out^2)] - aumenta quando Ack_out > 1
-        J11: Ack_out -> ; 5.0 * (Ack_out^2 / (1.0 + Ack_out^2));
-        """
+        J11: Ack_out -> ; 5.0 * (Ack_out_h / (1.0 + Ack_out_h));
+
+        // ===== EVENTOS (pulsos de Req_in) =====
+        // Substituem as 5 chamadas separadas de simulate(): o integrador
+        // roda uma única vez e Req_in muda nos instantes de PHASES
+        """ + "\n".join(f"        {event}" for event in antimony_events()) + "\n"
 
         try:
-            rr = te.loadAntimonyModel(antimony_code)
+            rr = _load_cached_model(antimony_code)
+            # Fora do estado em cache: mudar o integrador vale na próxima execução
+            configure_integrator(rr)
+            # Req_in é alvo dos eventos: vem na saída junto com as espécies
+            rr.timeCourseSelections = ['time'] + list(rr.getFloatingSpeciesIds()) + ['Req_in']
             logger.info("✓ Modelo Tellurium criado com sucesso!")
-            logger.info(f"  Espécies: {rr.getFloatingSpeciesIds()}")
-            logger.info(f"  Parâmetros: {rr.getGlobalParameterIds()}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f"  Espécies: {rr.getFloatingSpeciesIds()}")
+                logger.info(f"  Parâmetros: {rr.getGlobalParameterIds()}")
             return rr
         except Exception as e:
             logger.error(f"❌ Erro ao criar modelo: {e}")
             raise
 
 
-def run_tellurium_simulation(rr) -> pd.DataFrame:
+def _load_cached_model(antimony_code: str):
+    """
+    Carrega o modelo do cache em CACHE, compilando-o e salvando se preciso.
+
+    O estado salvo inclui o código já compilado pelo LLVM: carregar do cache
+    evita reprocessar o Antimony e recompilar o modelo. A chave muda junto
+    com o código do modelo ou com a versão do libRoadRunner. Um arquivo de
+    cache ilegível é descartado e o modelo é recompilado.
+    """
+    h = hashlib.sha256((antimony_code + roadrunner.__version__).encode()).hexdigest()[:16]
+    cache_path = join(CACHE, f"rr_{h}.state")
+
+    if exists(cache_path):
+        try:
+            rr = roadrunner.RoadRunner()
+            rr.loadState(cache_path)
+            logger.debug(f"Modelo carregado do cache: {cache_path}")
+            return rr
+        except Exception as e:
+            logger.warning(f"Cache inválido ({e}), recompilando: {cache_path}")
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(cache_path)
+
+    rr = te.loadAntimonyModel(antimony_code)
+    os.makedirs(CACHE, exist_ok=True)
+    # Grava num arquivo temporário e troca de uma vez: uma escrita
+    # interrompida (ou dois processos ao mesmo tempo) não deixa um estado
+    # pela metade no caminho final
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        rr.saveState(tmp_path)
+        os.replace(tmp_path, cache_path)
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+    logger.debug(f"Modelo salvo no cache: {cache_path}")
+    return rr
+
+
+def configure_integrator(rr):
+    """
+    Fixa o integrador CVODE em modo stiff (BDF).
+
+    O acoplamento J8 (Req_out * Ack_out) e a saturação de J11 tornam o
+    sistema levemente rígido; com BDF e a Jacobiana simbólica que o
+    libRoadRunner deriva do SBML, o CVODE precisa de menos avaliações do RHS.
     """
-    Executa simulação em 5 fases com mudanças de Req_in.
+    rr.setIntegrator('cvode')
+    rr.integrator.stiff = True
+    rr.integrator.maximum_num_steps = 20000
+    rr.integrator.absolute_tolerance = 1e-10
+    # Passo inicial fixo após cada evento: com a estimativa automática, o
+    # reinício em t=50 (espécies ~0) encolhia o passo até t + h == t e o
+    # CVODE emitia avisos. 1e-7 fica no meio da faixa que roda limpa
+    # (1e-6 a 1e-8) em toda a grade da varredura
+    rr.integrator.initial_time_step = 1e-7
+    # Só calcula a Jacobiana se o DEBUG estiver ligado
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"  Jacobiana: {rr.getFullJacobian().shape}")
+
+
+def run_tellurium_simulation(rr, n_points: int = 501) -> pd.DataFrame:
+    """
+    Executa a simulação em 5 fases com mudanças de Req_in.
     Fase 1: Req_in=0 (t=0-10)
     Fase 2: Req_in=1 (t=10-30)
     Fase 3: Req_in=0 (t=30-50)
     Fase 4: Req_in=1 (t=50-70)
     Fase 5: Req_in=0 (t=70-100)
+    (cronograma definido em utils.phases.PHASES)
+
+    As transições de Req_in são eventos do próprio modelo (E1..E4), então
+    uma única chamada a simulate() cobre as 5 fases sem reinicializar o
+    integrador entre elas.
+
+    `n_points` é só a densidade da saída: o CVODE escolhe os próprios passos
+    internos, então menos pontos não mudam a precisão da integração.
     """
     with _timed_debug(logger, "Executando simulação Tellurium 5 fases"):
 
-        all_data = []
-        species_names = rr.getFloatingSpeciesIds()
-
-        # ===== FASE 1: t=0-10, Req_in=0 =====
-        rr['Req_in'] = 0.0
-        rr.resetToOrigin()
-        result1 = rr.simulate(0, 10, 100)
-        # Extrai dados: coluna 0 é tempo, depois as espécies
-        time1 = result1[:, 0]
-        df1 = pd.DataFrame({name: result1[:, i + 1] for i, name in enumerate(species_names)}, index=time1)
-        df1['Req_in'] = 0.0
-        all_data.append(df1)
-
-        logger.info(f"✓ Fase 1 (t=0-10, Req_in=0): Req_out={df1['Req_out'].iloc[-1]:.4f}, Ack_out={df1['Ack_out'].iloc[-1]:.4f}")
-
-        # ===== FASE 2: t=10-30, Req_in=1 =====
-        rr['Req_in'] = 1.0
-        # Inicia do estado final da fase 1
-        for i, name in enumerate(species_names):
-            rr[name] = df1[name].iloc[-1]
-
-        result2 = rr.simulate(10, 30, 200)
-        time2 = result2[:, 0]
-        df2 = pd.DataFrame({name: result2[:, i + 1] for i, name in enumerate(species_names)}, index=time2)
-        df2['Req_in'] = 1.0
-        all_data.append(df2)
-
-        logger.info(f"✓ Fase 2 (t=10-30, Req_in=1): Req_out={df2['Req_out'].iloc[-1]:.4f}, Ack_out={df2['Ack_out'].iloc[-1]:.4f}")
-
-        # ===== FASE 3: t=30-50, Req_in=0 =====
-        rr['Req_in'] = 0.0
-        for i, name in enumerate(species_names):
-            rr[name] = df2[name].iloc[-1]
-
-        result3 = rr.simulate(30, 50, 200)
-        time3 = result3[:, 0]
-        df3 = pd.DataFrame({name: result3[:, i + 1] for i, name in enumerate(species_names)}, index=time3)
-        df3['Req_in'] = 0.0
-        all_data.append(df3)
-
-        logger.info(f"✓ Fase 3 (t=30-50, Req_in=0): Req_out={df3['Req_out'].iloc[-1]:.4f}, Ack_out={df3['Ack_out'].iloc[-1]:.4f}")
-
-        # ===== FASE 4: t=50-70, Req_in=1 =====
-        rr['Req_in'] = 1.0
-        for i, name in enumerate(species_names):
-            rr[name] = df3[name].iloc[-1]
-
-        result4 = rr.simulate(50, 70, 200)
-        time4 = result4[:, 0]
-        df4 = pd.DataFrame({name: result4[:, i + 1] for i, name in enumerate(species_names)}, index=time4)
-        df4['Req_in'] = 1.0
-        all_data.append(df4)
-
-        logger.info(f"✓ Fase 4 (t=50-70, Req_in=1): Req_out={df4['Req_out'].iloc[-1]:.4f}, Ack_out={df4['Ack_out'].iloc[-1]:.4f}")
-
-        # ===== FASE 5: t=70-100, Req_in=0 =====
-        rr['Req_in'] = 0.0
-        for i, name in enumerate(species_names):
-            rr[name] = df4[name].iloc[-1]
-
-        result5 = rr.simulate(70, 100, 300)
-        time5 = result5[:, 0]
-        df5 = pd.DataFrame({name: result5[:, i + 1] for i, name in enumerate(species_names)}, index=time5)
-        df5['Req_in'] = 0.0
-        all_data.append(df5)
-
-        logger.info(f"✓ Fase 5 (t=70-100, Req_in=0): Req_out={df5['Req_out'].iloc[-1]:.4f}, Ack_out={df5['Ack_out'].iloc[-1]:.4f}")
-
-        # Combina todos os dados
-        data = pd.concat(all_data, ignore_index=False)
+        # reset() volta tempo e espécies ao estado inicial sem refazer o modelo;
+        # Req_in é alterado pelos eventos e não é restaurado, então volta à mão
+        rr.reset()
+        rr['Req_in'] = PHASES[0][2]
+        result = rr.simulate(PHASES[0][0], PHASES[-1][1], n_points)
+        time = result[:, 0]
+
+        # Nomes das espécies vêm junto com o resultado ('[mRNA_Req]', ...),
+        # sem outra chamada ao modelo a cada simulação da varredura
+        species_names = [name.strip('[]') for name in result.colnames[1:]]
+
+        # Resumo de cada fase lido direto do array, sem passar pelo pandas
+        # (pulado nos workers da varredura, que rodam em WARNING, ou se a
+        # seleção de saída não tiver Req_out e Ack_out)
+        col = {name: i + 1 for i, name in enumerate(species_names)}
+        if logger.isEnabledFor(logging.INFO) and {'Req_out', 'Ack_out'} <= col.keys():
+            fins_fase = [t1 for _, t1, _ in PHASES]
+            for fase, (t_fim, i) in enumerate(zip(fins_fase, np.searchsorted(time, fins_fase, side='right') - 1), start=1):
+                logger.info(f"✓ Fase {fase} (t≤{t_fim}): Req_out={result[i, col['Req_out']]:.4f}, Ack_out={result[i, col['Ack_out']]:.4f}")
+
+        # DataFrame montado uma única vez, só para quem consome o resultado
+        # (gráfico e main): coluna 0 é tempo, depois as espécies e Req_in
+        # (valor da simulação, já com os eventos aplicados)
+        data = pd.DataFrame(result[:, 1:], index=time, columns=species_names)
 
         logger.info(f"✅ Simulação Tellurium 5 fases: {len(data)} pontos com CONTINUIDADE")
 
         return data
 
 
-def show_tellurium_plot(data: pd.DataFrame):
-    """Exibe gráficos da simulação Tellurium."""
+def show_tellurium_plot(data: pd.DataFrame, save_path: str | None = None):
+    """
+    Exibe gráficos da simulação Tellurium.
+
+    Se `save_path` for informado, salva a figura em arquivo (PNG) em vez de
+    abrir a janela com plt.show().
+    """
     logger.debug(f"Colunas: {list(data.columns)}")
     
-    fig, axes = plt.subplots(5, 1, figsize=(16, 14), sharex=True)
-    eventos = [10, 30, 50, 70]
+    fig, axes = _get_fig(5, 1, figsize=(16, 14))
+    eventos = EVENT_TIMES
 
     # Req_in
     if 'Req_in' in data.columns:
         axes[0].plot(data.index, data['Req_in'], color='green', linewidth=2.5, label='Req_in')
-        for t in eventos:
-            axes[0].axvline(x=t, color='gray', linestyle=':', alpha=0.5)
         axes[0].set_ylabel('Req_in', fontsize=11, fontweight='bold')
         axes[0].set_ylim(-0.1, 1.2)
+        _mark_events(axes[0], eventos)
         axes[0].grid(True, alpha=0.3)
         axes[0].legend()
 
     # mRNA_Req
     if 'mRNA_Req' in data.columns:
         axes[1].plot(data.index, data['mRNA_Req'], color='blue', linewidth=2, label='mRNA_Req')
-        for t in eventos:
-            axes[1].axvline(x=t, color='gray', linestyle=':', alpha=0.5)
         axes[1].set_ylabel('mRNA_Req', fontsize=11, fontweight='bold')
+        _mark_events(axes[1], eventos)
         axes[1].grid(True, alpha=0.3)
         axes[1].legend()
 
     # Req_out
     if 'Req_out' in data.columns:
         axes[2].plot(data.index, data['Req_out'], color='orange', linewidth=2.5, label='Req_out')
-        for t in eventos:
-            axes[2].axvline(x=t, color='gray', linestyle=':', alpha=0.5)
         axes[2].set_ylabel('Req_out', fontsize=11, fontweight='bold')
+        _mark_events(axes[2], eventos)
         axes[2].grid(True, alpha=0.3)
         axes[2].legend()
 
     # mRNA_Ack e Ack_out
     if 'mRNA_Ack' in data.columns:
         axes[3].plot(data.index, data['mRNA_Ack'], color='purple', linewidth=2, label='mRNA_Ack')
-        for t in eventos:
-            axes[3].axvline(x=t, color='gray', linestyle=':', alpha=0.5)
         axes[3].set_ylabel('mRNA_Ack', fontsize=11, fontweight='bold')
+        _mark_events(axes[3], eventos)
         axes[3].grid(True, alpha=0.3)
         axes[3].legend()
 
     if 'Ack_out' in data.columns:
         axes[4].plot(data.index, data['Ack_out'], color='red', linewidth=2.5, label='Ack_out')
-        for t in eventos:
-            axes[4].axvline(x=t, color='gray', linestyle=':', alpha=0.5)
         axes[4].set_ylabel('Ack_out', fontsize=11, fontweight='bold')
         axes[4].set_ylim(-0.1, 1.5)
+        _mark_events(axes[4], eventos)
         axes[4].grid(True, alpha=0.3)
         axes[4].legend()
 
     axes[4].set_xlabel('Tempo', fontsize=12, fontweight='bold')
     fig.suptitle('Two-Phase Handshake - Simulação Tellurium (Rede Metabólica com RNAs)',
                  fontsize=14, fontweight='bold', y=0.995)
-    plt.tight_layout()
-    plt.show()
+    fig.tight_layout()
+    if save_path:
+        fig.savefig(save_path, dpi=100)
+        plt.close(fig)
+        logger.info(f"Gráfico salvo em {save_path}")
+    else:
+        plt.show()
 
 
 # ==============================================================================
 # FUNÇÃO PRINCIPAL: Orquestra etapa 4
 # ==============================================================================
 
-def run_stage_4_tellurium():
-    """Executa Etapa 4: Simulação com Tellurium."""
+def run_stage_4_tellurium(plot: bool = True, save_path: str | None = None, n_points: int = 501):
+    """
+    Executa Etapa 4: Simulação com Tellurium.
+
+    Com `plot=False` a figura não é construída (útil para medir só a
+    simulação); `save_path` é repassado para show_tellurium_plot e
+    `n_points` para run_tellurium_simulation.
+    """
     with _timed(logger, "(Etapa 4) Simulação de Redes Metabólicas com Tellurium"):
 
         # Gera modelo
         rr = generate_tellurium_model()
 
         # Executa simulação
-        data = run_tellurium_simulation(rr)
+        data = run_tellurium_simulation(rr, n_points=n_points)
 
         # Exibe resultados
-        show_tellurium_plot(data)
+        if plot:
+            show_tellurium_plot(data, save_path=save_path)
 
         return data
 
 
+# ==============================================================================
+# VARREDURA DE PARÂMETROS: uma instância RoadRunner por processo
+# ==============================================================================
+
+# Modelo do processo worker (criado uma vez por processo em _init_sweep_worker)
+_worker_rr = None
+_worker_selections = None
+
+
+def _init_sweep_worker(log_level: int, species: list | None):
+    """Carrega o modelo no processo worker (do cache, sem recompilar)."""
+    global _worker_rr, _worker_selections
+    logging.getLogger().setLevel(log_level)
+    _worker_rr = generate_tellurium_model()
+    species = species or _worker_rr.getFloatingSpeciesIds()
+    _worker_selections = ['time'] + list(species) + ['Req_in']
+
+
+def _run_sweep_point(params: dict) -> pd.DataFrame:
+    """Simula um ponto da varredura no modelo do processo worker."""
+    rr = _worker_rr
+    rr.resetToOrigin()
+    for name, value in params.items():
+        # init(...) para o valor de partida do modelo; o valor corrente
+        # também, já que reset() não restaura parâmetros globais (é o valor
+        # que o integrador usa)
+        rr[f'init({name})'] = value
+        rr[name] = value
+    # Só as colunas pedidas atravessam a fronteira C++/Python
+    # (resetToOrigin() volta a seleção para todas as espécies, sem Req_in)
+    rr.timeCourseSelections = _worker_selections
+    return run_tellurium_simulation(rr)
+
+
+def sweep(param_grid: dict, max_workers: int | None = None, log_level: int = logging.WARNING,
+          species: list | None = None) -> list:
+    """
+    Varre o produto cartesiano de `param_grid` ({parâmetro: [valores]}) em
+    paralelo, com um processo e uma instância RoadRunner por worker.
+
+    Os workers registram logs a partir de `log_level` (padrão WARNING), para
+    não repetir o resumo de cada fase em todos os pontos.
+
+    `species` restringe as espécies devolvidas (ex.: ['Req_out']); por padrão
+    todas. A coluna Req_in é sempre incluída.
+
+    Retorna uma lista de (params, DataFrame), na ordem do produto cartesiano.
+    """
+    names = list(param_grid)
+    points = [dict(zip(names, values)) for values in itertools.product(*param_grid.values())]
+
+    with _timed(logger, "(Etapa 4) Varredura de %d conjuntos de parâmetros", len(points)):
+
+        # Garante o estado compilado em cache antes de criar os workers
+        generate_tellurium_model()
+
+        # Pontos enviados em blocos (~4 por worker) para não pagar uma ida e
+        # volta entre processos por simulação
+        workers = max_workers or os.cpu_count() or 1
+        chunksize = max(1, len(points) // (4 * workers))
+
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_sweep_worker,
+                                 initargs=(log_level, species)) as executor:
+            results = list(executor.map(_run_sweep_point, points, chunksize=chunksize))
+
+        return list(zip(points, results))
+
+
 if __name__ == "__main__":
     logging.basicConfig(
         level=logging.INFO,
@@ -1,10 +1,20 @@
+import os
+
+# Importado primeiro: escolhe o backend do matplotlib (HEADLESS) antes do pyplot
+from utils.plot_functions import _get_fig, _mark_events
+
+import antimony
 import basico
+import roadrunner
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
-from os.path import join
+from os.path import join, exists
 import logging
+import re
+from functools import lru_cache
 from utils.logger_functions import _timed_debug, _timed
+from utils.phases import PHASES, EVENT_IDS, EVENT_TIMES, antimony_events
 """
 Two-Phase Handshake Protocol - Phase 1 (Request Phase)
 
@@ -55,6 +65,39 @@ logger = logging.getLogger(__name__)
 
 MODELS = "models"
 
+# Constantes de taxa (Mass Action)
+RATE_CONSTANTS = {
+    "k_req_out_prod": 2.0,   # Produção
+    "k_req_out_deg": 5.0,    # Degradação MUITO MAIOR
+    "k_ack_in_prod": 2.0,    # Produção
+    "k_ack_in_deg": 5.0,     # Degradação MUITO MAIOR
+    "k_ack_out_deg": 8.0,    # Degradação muito rápida
+}
+
+# Reações da cascata: (nome, esquema Antimony, lei de taxa Mass Action)
+_PHASE_REACTIONS = (
+    # Req_in → Req_out (produção, proporcional a Req_in)
+    ("R_Req_out_Production", "=> Req_out", "k_req_out_prod * Req_in"),
+    # Req_out degradação
+    ("R_Req_out_Degradation", "Req_out =>", "k_req_out_deg * Req_out"),
+    # Req_out → Ack_in
+    ("R_Ack_in_Production", "Req_out => Req_out + Ack_in", "k_ack_in_prod * Req_out"),
+    # Ack_in degradação
+    ("R_Ack_in_Degradation", "Ack_in =>", "k_ack_in_deg * Ack_in"),
+    # Ack_out degradação (ativada por Ack_in)
+    ("R_Ack_out_Degradation", "Ack_in + Ack_out => Ack_in", "k_ack_out_deg * Ack_in * Ack_out"),
+)
+
+# Concentrações iniciais das espécies integradas
+INITIAL_CONCENTRATIONS = {"Req_out": 0.0, "Ack_in": 0.0, "Ack_out": 1.0}
+
+# O modelo só é construído uma vez por processo; chamadas seguidas de
+# generate_handshake_model() apenas restauram o estado inicial
+_MODEL_BUILT = False
+
+# Sufixo que o COPASI acrescenta aos ids E1..E4 em exportações alternadas
+_EVENT_SUFFIX = re.compile(r'<event id="(' + "|".join(map(re.escape, EVENT_IDS)) + r')_0"')
+
 # ----------------------------------------------------------------------
 # Etapa 3: Validação Cinética e Interoperabilidade (COPASI/SBML -> Tellurium)
 # Foco: Simulação Determinística para validar as constantes de taxa e
@@ -67,266 +110,236 @@ def generate_handshake_model():
     """
     Gera um modelo COPASI para o protocolo Two-Phase Handshake.
     Cascata simples: Req_in → Req_out → Ack_in → inibe Ack_out
+
+    O modelo inteiro (parâmetros, espécies e reações) é escrito em Antimony,
+    convertido para SBML e carregado no COPASI em uma única chamada, em vez
+    de um add_parameter/add_species/add_reaction por elemento.
+
+    Se o modelo já foi construído neste processo (e continua sendo o modelo
+    ativo do basico), apenas restaura Req_in, as constantes de taxa e as
+    concentrações iniciais, desfazendo alterações feitas desde então.
     """
+    global _MODEL_BUILT
+    if _MODEL_BUILT and basico.get_model_name() == "Two Phase Handshake":
+        with _timed_debug(logger, "Reaproveitando modelo Two Phase-Handshake"):
+            basico.set_parameters("Req_in", initial_value=PHASES[0][2])
+            for name, value in RATE_CONSTANTS.items():
+                basico.set_parameters(name, initial_value=value)
+            for name, value in INITIAL_CONCENTRATIONS.items():
+                basico.set_species(name, initial_concentration=value)
+        return
+
     with _timed_debug(logger, "Criando modelo Two Phase-Handshake"):
-        basico.new_model(name="Two Phase Handshake")
+        parameters = "\n".join(f"    {name} = {value};" for name, value in RATE_CONSTANTS.items())
+        species = "\n".join(f"    {name} = {value};" for name, value in INITIAL_CONCENTRATIONS.items())
+        events = "\n".join(f"    {event}" for event in antimony_events())
+
+        model = f"""
+        model Two_Phase_Handshake()
+            species Req_out, Ack_in, Ack_out;
+
+            // Parâmetros (incluindo Req_in que será controlado por eventos)
+            Req_in = 0.0;
+        {parameters}
 
-        # Parâmetros (incluindo Req_in que será controlado por eventos)
-        basico.add_parameter(name="Req_in", value=0.0)  # Será controlado por eventos
-        basico.add_parameter(name="k_req_out_prod", value=2.0)   # Produção
-        basico.add_parameter(name="k_req_out_deg", value=5.0)    # Degradação MUITO MAIOR
-        basico.add_parameter(name="k_ack_in_prod", value=2.0)    # Produção
-        basico.add_parameter(name="k_ack_in_deg", value=5.0)     # Degradação MUITO MAIOR
-        basico.add_parameter(name="k_ack_out_deg", value=8.0)    # Degradação muito rápida
+            // Espécies (apenas as que se integram)
+        {species}
 
-        # Espécies (apenas as que se integram)
-        basico.add_species(name="Req_out", initial_concentration=0.0)
-        basico.add_species(name="Ack_in", initial_concentration=0.0)
-        basico.add_species(name="Ack_out", initial_concentration=1.0)
+        {define_phase_reactions()}
+
+            // Eventos: Req_in muda no início de cada fase
+        {events}
+        end
+
+        Two_Phase_Handshake is "Two Phase Handshake";
+        """
+
+        antimony.clearPreviousLoads()
+        if antimony.loadAntimonyString(model) < 0:
+            raise RuntimeError(f"Erro no modelo Antimony: {antimony.getLastError()}")
+        basico.load_model_from_string(antimony.getSBMLString("Two_Phase_Handshake"))
 
         logger.info("Modelo criado com sucesso!")
 
-        define_phase_reactions()
+    _MODEL_BUILT = True
 
 
-def define_phase_reactions():
+def define_phase_reactions() -> str:
     """
     Define as reações da cascata de ativação com inibição.
-    Usa Mass Action Law com estequiometria para calcular automaticamente.
+    Usa Mass Action Law com as constantes de RATE_CONSTANTS; as reações
+    ficam em _PHASE_REACTIONS.
+
+    Retorna o bloco de reações em Antimony, para ser incluído no modelo
+    montado por generate_handshake_model().
     """
-    with _timed_debug(logger, "Adicionando reações"):
-
-        # Req_in → Req_out (produção)
-        r1 = basico.add_reaction(
-            name="R_Req_out_Production",
-            scheme="-> Req_out",
-            reversible=False
-        )
-        try:
-            # Acessa via get_reactions e modifica diretamente
-            rxns = basico.get_reactions()
-            rxns.loc['R_Req_out_Production', 'k1'] = 2.0
-            logger.info("✓ R1 (Req_out produção): k=2.0")
-        except Exception as e:
-            logger.warning(f"⚠ R1: {e}")
-        
-        # Req_out degradação
-        r2 = basico.add_reaction(
-            name="R_Req_out_Degradation",
-            scheme="Req_out -> ",
-            reversible=False
-        )
-        try:
-            rxns = basico.get_reactions()
-            rxns.loc['R_Req_out_Degradation', 'k1'] = 5.0
-            logger.info("✓ R2 (Req_out degradação): k=5.0")
-        except Exception as e:
-            logger.warning(f"⚠ R2: {e}")
-
-        # Req_out → Ack_in
-        r3 = basico.add_reaction(
-            name="R_Ack_in_Production",
-            scheme="Req_out -> Req_out + Ack_in",
-            reversible=False
-        )
-        try:
-            rxns = basico.get_reactions()
-            rxns.loc['R_Ack_in_Production', 'k1'] = 2.0
-            logger.info("✓ R3 (Ack_in produção): k=2.0")
-        except Exception as e:
-            logger.warning(f"⚠ R3: {e}")
-        
-        # Ack_in degradação
-        r4 = basico.add_reaction(
-            name="R_Ack_in_Degradation",
-            scheme="Ack_in -> ",
-            reversible=False
-        )
-        try:
-            rxns = basico.get_reactions()
-            rxns.loc['R_Ack_in_Degradation', 'k1'] = 5.0
-            logger.info("✓ R4 (Ack_in degradação): k=5.0")
-        except Exception as e:
-            logger.warning(f"⚠ R4: {e}")
-
-        # Ack_out degradação (ativada por Ack_in)
-        r5 = basico.add_reaction(
-            name="R_Ack_out_Degradation",
-            scheme="Ack_in + Ack_out -> Ack_in",
-            reversible=False
-        )
-        try:
-            rxns = basico.get_reactions()
-            rxns.loc['R_Ack_out_Degradation', 'k1'] = 8.0
-            logger.info("✓ R5 (Ack_out degradação): k=8.0")
-        except Exception as e:
-            logger.warning(f"⚠ R5: {e}")
-
-        logger.info("✅ 5 reações adicionadas com Mass Action!")
+    reactions = "\n".join(
+        f"            {name}: {scheme}; {rate_law};" for name, scheme, rate_law in _PHASE_REACTIONS
+    )
+    logger.debug(f"✅ {len(_PHASE_REACTIONS)} reações definidas com Mass Action!")
+    return reactions
+
+
+def _export_sbml() -> str:
+    """
+    Exporta o modelo COPASI atual como SBML.
+
+    O COPASI alterna o id dos eventos a cada exportação (E1, E1_0, E1, ...);
+    o sufixo é removido, só dos eventos de Req_in (EVENT_IDS), para que o
+    mesmo modelo gere sempre o mesmo texto.
+    """
+    sbml = basico.save_model_to_string(type="SBML")
+    return _EVENT_SUFFIX.sub(r'<event id="\1"', sbml)
 
 
 def save_model(file_dir: str = MODELS):
-    """Salva o modelo COPASI atual no formato SBML no diretório especificado."""
-    with _timed(logger, f"Salvando modelo em {file_dir} | formato: SBML"):
-        basico.save_model(
-            join(file_dir, "two_phase_handshake_model.sbml"),
-            type="SBML"
-        )
+    """
+    Salva o modelo COPASI atual no formato SBML no diretório especificado.
+
+    Se o arquivo já tem exatamente o mesmo SBML, não reescreve.
+    """
+    with _timed(logger, "Salvando modelo em %s | formato: SBML", file_dir):
+        os.makedirs(file_dir, exist_ok=True)
+        path = join(file_dir, "two_phase_handshake_model.sbml")
+        sbml = _export_sbml()
+
+        if exists(path):
+            with open(path, encoding="utf-8") as f:
+                if f.read() == sbml:
+                    logger.debug(f"Modelo inalterado, {path} mantido")
+                    return
+
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(sbml)
+
+
+def _run_copasi(n_output: int) -> pd.DataFrame:
+    """
+    Integra t=0-100 no COPASI em um único time course: as trocas de Req_in
+    são eventos do modelo, então o LSODA não é reiniciado entre as fases.
+
+    Em basico, `intervals` é só o número de pontos de saída (o LSODA do
+    COPASI escolhe os próprios passos internos). Como Req_in é alvo de
+    eventos, o COPASI já o devolve na saída (como `Values[Req_in]`).
+    """
+    data = basico.run_time_course(duration=PHASES[-1][1], intervals=n_output)
+    return data.rename(columns={'Values[Req_in]': 'Req_in'})
+
+
+@lru_cache(maxsize=4)
+def _get_rr(sbml: str) -> roadrunner.RoadRunner:
+    """Compila o SBML no libRoadRunner uma vez por texto de modelo."""
+    logger.debug("Compilando SBML no libRoadRunner")
+    return roadrunner.RoadRunner(sbml)
 
 
-def run_simulation() -> pd.DataFrame:
+def _run_roadrunner(n_output: int) -> pd.DataFrame:
+    """
+    Integra o mesmo modelo com o libRoadRunner, que compila as leis de taxa
+    (e os eventos de Req_in) do SBML exportado pelo COPASI para código
+    nativo (LLVM).
+
+    A instância compilada é reaproveitada enquanto o SBML não mudar;
+    resetToOrigin() devolve tempo, espécies e parâmetros aos valores do SBML.
+    """
+    rr = _get_rr(_export_sbml())
+    rr.resetToOrigin()
+    columns = ['Req_in'] + list(rr.model.getFloatingSpeciesIds())
+    rr.timeCourseSelections = ['time'] + columns
+
+    result = rr.simulate(PHASES[0][0], PHASES[-1][1], n_output + 1)
+    return pd.DataFrame(result[:, 1:], index=pd.Index(result[:, 0], name="Time"), columns=columns)
+
+
+def run_simulation(backend: str = "copasi", n_output: int = 200) -> pd.DataFrame:
     """
     Executa 5 fases com Req_in mudando em pontos específicos.
-    Cada fase começa exatamente onde a anterior terminou (SEM RESET).
+    Req_in é trocado pelos eventos do modelo (E1..E4), então uma única
+    integração cobre as 5 fases, com continuidade total entre elas.
+
+    `backend` escolhe o integrador: "copasi" (padrão) ou "roadrunner"
+    (libRoadRunner sobre o SBML do modelo atual, com o mesmo resultado).
+    `n_output` é o número de pontos gravados em t=0-100 (o suficiente para o
+    gráfico); não altera o passo do integrador.
     """
-    with _timed_debug(logger, "Executando simulação 5 fases com CONTINUIDADE"):
-        
-        all_data = []
-        
-        # ============= FASE 1: t=0-10, Req_in=0 =============
-        basico.set_parameters("Req_in", 0.0)
-        data1 = basico.run_time_course(duration=10, intervals=100, intervals_output=100)
-        all_data.append(data1)
-        
-        logger.info(f"✓ Fase 1 (t=0-10, Req_in=0): Final state: Req_out={data1['Req_out'].iloc[-1]:.4f}, Ack_in={data1['Ack_in'].iloc[-1]:.4f}, Ack_out={data1['Ack_out'].iloc[-1]:.4f}")
-        
-        # ============= FASE 2: t=10-30, Req_in=1 =============
-        # Muda Req_in ANTES de rodar
-        basico.set_parameters("Req_in", 1.0)
-        # IMPORTANTE: set initial concentrations com valores do final da fase 1
-        basico.set_species("Req_out", data1['Req_out'].iloc[-1])
-        basico.set_species("Ack_in", data1['Ack_in'].iloc[-1])
-        basico.set_species("Ack_out", data1['Ack_out'].iloc[-1])
-        
-        data2 = basico.run_time_course(duration=20, intervals=200, intervals_output=200)
-        data2.index = data2.index + 10  # Ajusta tempo para continuar de t=10
-        all_data.append(data2)
-        
-        logger.info(f"✓ Fase 2 (t=10-30, Req_in=1): Final state: Req_out={data2['Req_out'].iloc[-1]:.4f}, Ack_in={data2['Ack_in'].iloc[-1]:.4f}, Ack_out={data2['Ack_out'].iloc[-1]:.4f}")
-        
-        # ============= FASE 3: t=30-50, Req_in=0 =============
-        basico.set_parameters("Req_in", 0.0)
-        basico.set_species("Req_out", data2['Req_out'].iloc[-1])
-        basico.set_species("Ack_in", data2['Ack_in'].iloc[-1])
-        basico.set_species("Ack_out", data2['Ack_out'].iloc[-1])
-        
-        data3 = basico.run_time_course(duration=20, intervals=200, intervals_output=200)
-        data3.index = data3.index + 30  # Ajusta tempo
-        all_data.append(data3)
+    if backend not in ("copasi", "roadrunner"):
+        raise ValueError(f"backend inválido: {backend!r} (use 'copasi' ou 'roadrunner')")
+
+    with _timed_debug(logger, "Executando simulação 5 fases com CONTINUIDADE (%s)", backend):
+
+        if backend == "roadrunner":
+            data = _run_roadrunner(n_output)
+        else:
+            data = _run_copasi(n_output)
+
+        # Resumo do estado no fim de cada fase
+        if logger.isEnabledFor(logging.INFO):
+            t = data.index.values
+            fins = np.searchsorted(t, [t1 for _, t1, _ in PHASES], side='right') - 1
+            for fase, ((t0, t1, req_in), i) in enumerate(zip(PHASES, fins), start=1):
+                final = data.iloc[i]
+                logger.info(f"✓ Fase {fase} (t={t0}-{t1}, Req_in={req_in:g}): Final state: Req_out={final['Req_out']:.4f}, Ack_in={final['Ack_in']:.4f}, Ack_out={final['Ack_out']:.4f}")
         
-        logger.info(f"✓ Fase 3 (t=30-50, Req_in=0): Final state: Req_out={data3['Req_out'].iloc[-1]:.4f}, Ack_in={data3['Ack_in'].iloc[-1]:.4f}, Ack_out={data3['Ack_out'].iloc[-1]:.4f}")
-        
-        # ============= FASE 4: t=50-70, Req_in=1 =============
-        basico.set_parameters("Req_in", 1.0)
-        basico.set_species("Req_out", data3['Req_out'].iloc[-1])
-        basico.set_species("Ack_in", data3['Ack_in'].iloc[-1])
-        basico.set_species("Ack_out", data3['Ack_out'].iloc[-1])
-        
-        data4 = basico.run_time_course(duration=20, intervals=200, intervals_output=200)
-        data4.index = data4.index + 50  # Ajusta tempo
-        all_data.append(data4)
-        
-        logger.info(f"✓ Fase 4 (t=50-70, Req_in=1): Final state: Req_out={data4['Req_out'].iloc[-1]:.4f}, Ack_in={data4['Ack_in'].iloc[-1]:.4f}, Ack_out={data4['Ack_out'].iloc[-1]:.4f}")
-        
-        # ============= FASE 5: t=70-100, Req_in=0 =============
-        basico.set_parameters("Req_in", 0.0)
-        basico.set_species("Req_out", data4['Req_out'].iloc[-1])
-        basico.set_species("Ack_in", data4['Ack_in'].iloc[-1])
-        basico.set_species("Ack_out", data4['Ack_out'].iloc[-1])
-        
-        data5 = basico.run_time_course(duration=30, intervals=300, intervals_output=300)
-        data5.index = data5.index + 70  # Ajusta tempo
-        all_data.append(data5)
-        
-        logger.info(f"✓ Fase 5 (t=70-100, Req_in=0): Final state: Req_out={data5['Req_out'].iloc[-1]:.4f}, Ack_in={data5['Ack_in'].iloc[-1]:.4f}, Ack_out={data5['Ack_out'].iloc[-1]:.4f}")
-        
-        # ============= Combina dados =============
-        data = pd.concat(all_data, ignore_index=False)
-        
-        # Reconstrói Req_in para visualização
-        time_values = data.index.values
-        req_in_values = np.zeros_like(time_values, dtype=float)
-        
-        for t_idx, t_val in enumerate(time_values):
-            if t_val >= 70:
-                req_in_values[t_idx] = 0.0
-            elif t_val >= 50:
-                req_in_values[t_idx] = 1.0
-            elif t_val >= 30:
-                req_in_values[t_idx] = 0.0
-            elif t_val >= 10:
-                req_in_values[t_idx] = 1.0
-            else:
-                req_in_values[t_idx] = 0.0
-        
-        data.insert(0, 'Req_in', req_in_values)
+        # Req_in vem da própria simulação (eventos); primeira coluna, como antes
+        data = data[['Req_in'] + [c for c in data.columns if c != 'Req_in']]
         
         logger.info(f"✅ Simulação 5 fases: {len(data)} pontos com CONTINUIDADE TOTAL")
     
     return data
 
 
-def show_plot(data: pd.DataFrame):
-    """Exibe o Two-Phase Handshake Protocol em gráficos separados."""
-    logger.debug(f"Colunas disponíveis no DataFrame: {list(data.columns)}")
-    logger.debug(f"Primeiras linhas:\n{data.head()}")
-    logger.debug(f"Últimas linhas:\n{data.tail()}")
-    logger.info(f"Req_in range: {data['Req_in'].min():.3f} - {data['Req_in'].max():.3f}")
-    logger.info(f"Req_out range: {data['Req_out'].min():.3f} - {data['Req_out'].max():.3f}")
-    logger.info(f"Ack_in range: {data['Ack_in'].min():.3f} - {data['Ack_in'].max():.3f}")
-    logger.info(f"Ack_out range: {data['Ack_out'].min():.3f} - {data['Ack_out'].max():.3f}")
+def show_plot(data: pd.DataFrame, save_path: str | None = None):
+    """
+    Exibe o Two-Phase Handshake Protocol em gráficos separados.
+
+    Se `save_path` for informado, salva a figura em arquivo (PNG) em vez de
+    abrir a janela com plt.show().
+    """
+    # f-strings são formatadas antes do filtro de nível: o repr do DataFrame
+    # e os min/max só são calculados se o nível estiver habilitado
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Colunas disponíveis no DataFrame: {list(data.columns)}")
+        logger.debug(f"Primeiras linhas:\n{data.head()}")
+        logger.debug(f"Últimas linhas:\n{data.tail()}")
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(f"Req_in range: {data['Req_in'].min():.3f} - {data['Req_in'].max():.3f}")
+        logger.info(f"Req_out range: {data['Req_out'].min():.3f} - {data['Req_out'].max():.3f}")
+        logger.info(f"Ack_in range: {data['Ack_in'].min():.3f} - {data['Ack_in'].max():.3f}")
+        logger.info(f"Ack_out range: {data['Ack_out'].min():.3f} - {data['Ack_out'].max():.3f}")
     
     # Criar figura com 4 subplots
-    fig, axes = plt.subplots(4, 1, figsize=(14, 10), sharex=True)
+    fig, axes = _get_fig(4, 1, figsize=(14, 10))
     
     # Marcadores de eventos para todos os gráficos
-    eventos = [10, 30, 50, 70]
-    
-    # Req_in (entrada)
-    if 'Req_in' in data.columns:
-        axes[0].plot(data.index, data['Req_in'], color='green', linewidth=2.5, label='Req_in (entrada)')
-        for t in eventos:
-            axes[0].axvline(x=t, color='gray', linestyle=':', alpha=0.5)
-        axes[0].set_ylabel('Req_in', fontsize=11, fontweight='bold')
-        axes[0].set_ylim(-0.1, 1.2)
-        axes[0].grid(True, alpha=0.3)
-        axes[0].legend(loc='upper right', fontsize=10)
-    
-    # Req_out
-    if 'Req_out' in data.columns:
-        axes[1].plot(data.index, data['Req_out'], color='orange', linewidth=2.5, label='Req_out')
-        for t in eventos:
-            axes[1].axvline(x=t, color='gray', linestyle=':', alpha=0.5)
-        axes[1].set_ylabel('Req_out', fontsize=11, fontweight='bold')
-        axes[1].set_ylim(-0.1, 1.2)
-        axes[1].grid(True, alpha=0.3)
-        axes[1].legend(loc='upper right', fontsize=10)
+    eventos = EVENT_TIMES
     
-    # Ack_in
-    if 'Ack_in' in data.columns:
-        axes[2].plot(data.index, data['Ack_in'], color='blue', linewidth=2.5, label='Ack_in')
-        for t in eventos:
-            axes[2].axvline(x=t, color='gray', linestyle=':', alpha=0.5)
-        axes[2].set_ylabel('Ack_in', fontsize=11, fontweight='bold')
-        axes[2].set_ylim(-0.1, 1.2)
-        axes[2].grid(True, alpha=0.3)
-        axes[2].legend(loc='upper right', fontsize=10)
+    # Req_in (entrada), Req_out, Ack_in e Ack_out desenhados numa única
+    # chamada do pandas, um eixo por coluna
+    cores = {'Req_in': 'green', 'Req_out': 'orange', 'Ack_in': 'blue', 'Ack_out': 'red'}
+    colunas = [c for c in cores if c in data.columns]
+    eixos = [axes[list(cores).index(c)] for c in colunas]
+    data[colunas].rename(columns={'Req_in': 'Req_in (entrada)'}).plot(
+        subplots=True, ax=eixos, color=[cores[c] for c in colunas],
+        linewidth=2.5, legend=False
+    )
     
-    # Ack_out
-    if 'Ack_out' in data.columns:
-        axes[3].plot(data.index, data['Ack_out'], color='red', linewidth=2.5, label='Ack_out')
-        for t in eventos:
-            axes[3].axvline(x=t, color='gray', linestyle=':', alpha=0.5)
-        axes[3].set_ylabel('Ack_out', fontsize=11, fontweight='bold')
-        axes[3].set_ylim(-0.1, 1.2)
-        axes[3].grid(True, alpha=0.3)
-        axes[3].legend(loc='upper right', fontsize=10)
+    for coluna, ax in zip(colunas, eixos):
+        ax.set_ylabel(coluna, fontsize=11, fontweight='bold')
+        ax.set_ylim(-0.1, 1.2)
+        _mark_events(ax, eventos)
+        ax.grid(True, alpha=0.3)
+        ax.legend(loc='upper right', fontsize=10)
     
     # Configurações gerais
     axes[3].set_xlabel('Tempo', fontsize=12, fontweight='bold')
     fig.suptitle('Protocolo Two-Phase Handshake - Cascata de Ativação com Inibição', 
                  fontsize=14, fontweight='bold', y=0.995)
-    plt.tight_layout()
-    plt.show()
+    fig.tight_layout()
+    if save_path:
+        fig.savefig(save_path, dpi=100)
+        plt.close(fig)
+        logger.info(f"Gráfico salvo em {save_path}")
+    else:
+        plt.show()
     
     return data
@@ -0,0 +1,223 @@
+"""
+Etapa 6: Ensemble estocástico (Gillespie) do Two-Phase Handshake
+================================================================
+
+Simula N trajetórias independentes do modelo da Etapa 4 (reações J1..J11 do
+modelo Antimony em `utils/PySB_hand_shake.py`) com o algoritmo direto de
+Gillespie (SSA). Cada trajetória roda em paralelo (`numba.prange`), com o
+estado de 4 espécies e as 11 propensidades mantidos em variáveis locais.
+
+As concentrações do modelo determinístico são convertidas em número de
+moléculas pelo fator de escala `omega` (moléculas por unidade de
+concentração): quanto maior `omega`, menor o ruído relativo.
+
+Estado = [mRNA_Req, Req_out, mRNA_Ack, Ack_out]
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from numba import njit, prange
+
+from utils.logger_functions import _timed
+from utils.plot_functions import _get_fig, _mark_events
+from utils.phases import PHASES, EVENT_TIMES
+from utils.rhs_handshake import PARAMS, SPECIES, Y0
+
+logger = logging.getLogger(__name__)
+
+# Variação de cada espécie por reação (J1..J11)
+STOICH = np.array([
+    [1, 0, 0, 0],     # J1: -> mRNA_Req
+    [-1, 0, 0, 0],    # J2: mRNA_Req ->
+    [0, 1, 0, 0],     # J3: mRNA_Req -> mRNA_Req + Req_out
+    [0, -1, 0, 0],    # J4: Req_out ->
+    [0, 0, 1, 0],     # J5: -> mRNA_Ack
+    [0, 0, -1, 0],    # J6: mRNA_Ack ->
+    [0, 0, 0, 1],     # J7: mRNA_Ack -> mRNA_Ack + Ack_out
+    [0, 0, 0, -1],    # J8: Req_out + Ack_out -> Req_out
+    [0, 0, 0, -1],    # J9: Ack_out ->
+    [0, 0, 0, 1],     # J10: -> Ack_out
+    [0, 0, 0, -1],    # J11: Ack_out ->
+], dtype=np.int64)
+
+
+@njit(cache=True)
+def _propensities(n, prod_req, K_req2, p, omega, a):
+    """
+    Preenche `a` com as propensidades J1..J11 para o estado `n` (moléculas).
+
+    `prod_req` (taxa de J1 na fase atual) e `K_req2` não dependem do estado
+    e chegam pré-calculados.
+    """
+    x1 = n[1] / omega
+    x2 = n[2] / omega
+    x3 = n[3] / omega
+    x1_2 = x1 * x1
+    x2_2 = x2 * x2
+    x3_2 = x3 * x3
+
+    a[0] = omega * prod_req
+    a[1] = p[2] * n[0]
+    a[2] = p[3] * n[0]
+    a[3] = p[4] * n[1]
+    a[4] = omega * p[5] * x1_2 / (K_req2 + x1_2)
+    a[5] = p[6] * n[2]
+    a[6] = p[7] * n[2]
+    a[7] = p[8] * x1 * n[3]
+    a[8] = 3.0 * (x2_2 / (1.0 + x2_2)) * n[3]
+    a[9] = omega * 2.5
+    a[10] = omega * 5.0 * (x3_2 / (1.0 + x3_2))
+
+
+@njit(parallel=True, cache=True)
+def _ssa_ensemble(n_runs, t_grid, edges, req_in_values, y0, p, omega, stoich, seed):
+    """
+    Núcleo SSA: uma trajetória por iteração do `prange`.
+
+    `edges` são os instantes de troca de Req_in e `req_in_values[k]` é o valor
+    de Req_in no intervalo [edges[k-1], edges[k]). Retorna (n_runs, T, 4) em
+    unidades de concentração, em float32: a contagem de moléculas continua
+    em float64, só a saída gravada usa metade da memória.
+    """
+    n_t = t_grid.shape[0]
+    n_sp = y0.shape[0]
+    n_rx = stoich.shape[0]
+    out = np.empty((n_runs, n_t, n_sp), dtype=np.float32)
+
+    # Termos constantes por fase, fora do laço de reações
+    req_in2 = req_in_values * req_in_values
+    prod_req = p[1] * req_in2 / (0.25 + req_in2)
+    K_req2 = p[9] * p[9]
+
+    for r in prange(n_runs):
+        np.random.seed(seed + r)
+        n = np.empty(n_sp)
+        for s in range(n_sp):
+            n[s] = np.round(y0[s] * omega)
+        a = np.empty(n_rx)
+
+        t = t_grid[0]
+        k = 0
+        fase = 0
+        while k < n_t:
+            while fase < edges.shape[0] and t >= edges[fase]:
+                fase += 1
+            t_edge = edges[fase] if fase < edges.shape[0] else np.inf
+
+            _propensities(n, prod_req[fase], K_req2, p, omega, a)
+            a0 = 0.0
+            for j in range(n_rx):
+                a0 += a[j]
+
+            t_next = t - np.log(np.random.random()) / a0 if a0 > 0.0 else np.inf
+
+            # Troca de Req_in antes da próxima reação: avança até a borda
+            # e sorteia de novo (o processo é sem memória)
+            crossed_edge = t_next >= t_edge
+            if crossed_edge:
+                t_next = t_edge
+
+            while k < n_t and t_grid[k] < t_next:
+                for s in range(n_sp):
+                    out[r, k, s] = n[s] / omega
+                k += 1
+
+            t = t_next
+            if crossed_edge or k >= n_t:
+                continue
+
+            u = np.random.random() * a0
+            j = 0
+            acc = a[0]
+            while acc < u and j < n_rx - 1:
+                j += 1
+                acc += a[j]
+            for s in range(n_sp):
+                n[s] += stoich[j, s]
+                if n[s] < 0.0:
+                    n[s] = 0.0
+
+    return out
+
+
+def run_stochastic_ensemble(n_runs: int = 1000, omega: float = 100.0,
+                            n_points: int = 1001, seed: int = 0):
+    """
+    Executa `n_runs` trajetórias SSA das 5 fases de Req_in.
+
+    Retorna (time, trajectories), onde `trajectories` tem forma
+    (n_runs, n_points, 4), em float32, com as espécies na ordem de SPECIES.
+    """
+    if n_runs < 1 or n_points < 2:
+        raise ValueError(f"Ensemble precisa de n_runs >= 1 e n_points >= 2 (recebido {n_runs}, {n_points})")
+
+    with _timed(logger, "(Etapa 6) Ensemble Gillespie com %d trajetórias", n_runs):
+
+        t_grid = np.linspace(PHASES[0][0], PHASES[-1][1], n_points)
+        edges = np.array(EVENT_TIMES, dtype=float)
+        req_in_values = np.array([valor for _, _, valor in PHASES], dtype=float)
+
+        trajectories = _ssa_ensemble(n_runs, t_grid, edges, req_in_values,
+                                     Y0, PARAMS, omega, STOICH, seed)
+
+        return t_grid, trajectories
+
+
+def summarize_ensemble(time: np.ndarray, trajectories: np.ndarray) -> pd.DataFrame:
+    """Média e desvio padrão de cada espécie ao longo do tempo."""
+    # Sem trajetórias, mean/std só devolveriam NaN com RuntimeWarning
+    if trajectories.shape[0] == 0:
+        raise ValueError("Ensemble vazio: nenhuma trajetória para resumir")
+
+    # Acumula em float64 mesmo com trajetórias em float32
+    mean = trajectories.mean(axis=0, dtype=np.float64)
+    std = trajectories.std(axis=0, dtype=np.float64)
+    # Todas as colunas de uma vez: inserir coluna a coluna fragmenta o DataFrame
+    columns = {}
+    for i, name in enumerate(SPECIES):
+        columns[f"{name}_mean"] = mean[:, i]
+        columns[f"{name}_std"] = std[:, i]
+    summary = pd.DataFrame(columns, index=time)
+
+    logger.info(
+        f"✓ Ensemble: Req_out médio máx={summary['Req_out_mean'].max():.4f}, "
+        f"Ack_out médio mín={summary['Ack_out_mean'].min():.4f}"
+    )
+    return summary
+
+
+def show_ensemble_plot(summary: pd.DataFrame, save_path: str | None = None):
+    """
+    Exibe a média de cada espécie do ensemble, com uma faixa de ±1 desvio
+    padrão.
+
+    Se `save_path` for informado, salva a figura em arquivo (PNG) em vez de
+    abrir a janela com plt.show().
+    """
+    fig, axes = _get_fig(len(SPECIES), 1, figsize=(14, 12))
+    eventos = EVENT_TIMES
+    cores = ['blue', 'orange', 'purple', 'red']
+
+    for ax, name, cor in zip(axes, SPECIES, cores):
+        mean = summary[f"{name}_mean"]
+        std = summary[f"{name}_std"]
+        ax.plot(summary.index, mean, color=cor, linewidth=2, label=f"{name} (média)")
+        ax.fill_between(summary.index, mean - std, mean + std, color=cor, alpha=0.2, label="±1 desvio")
+        ax.set_ylabel(name, fontsize=11, fontweight='bold')
+        _mark_events(ax, eventos)
+        ax.grid(True, alpha=0.3)
+        ax.legend(loc='upper right', fontsize=10)
+
+    axes[-1].set_xlabel('Tempo', fontsize=12, fontweight='bold')
+    fig.suptitle('Two-Phase Handshake - Ensemble Estocástico (Gillespie)',
+                 fontsize=14, fontweight='bold', y=0.995)
+    fig.tight_layout()
+    if save_path:
+        fig.savefig(save_path, dpi=100)
+        plt.close(fig)
+        logger.info(f"Gráfico salvo em {save_path}")
+    else:
+        plt.show()
@@ -33,32 +33,30 @@ def setup_logger(debug=False):
 
 
 @contextmanager
-def _timed(logger: logging.Logger, message: str):
+def _timed_at(logger: logging.Logger, level: int, message: str, *args):
     """Context manager para medir e logar o tempo de execução de um bloco de código.
-    Usa nível INFO para logging."""
-    logger.info(f"▶️ {message}...")
-    start_time = time.perf_counter()
+    `message` é uma string de formatação do logging, com `args` formatados
+    só se o nível estiver habilitado; com `level` desabilitado não mede nem
+    formata nada, só registra a falha."""
+    enabled = logger.isEnabledFor(level)
+    if enabled:
+        logger.log(level, f"▶️ {message}...", *args)
+        start_time = time.perf_counter()
     try:
         yield
-        end_time = time.perf_counter()
-        duration = end_time - start_time
-        logger.info(f"✅ {message}... concluído em {duration:.3f}s.")
     except Exception:
-        logger.error(f"❌ {message}... FALHOU.", exc_info=True)
+        logger.error(f"❌ {message}... FALHOU.", *args, exc_info=True)
         raise
+    if enabled:
+        duration = time.perf_counter() - start_time
+        logger.log(level, f"✅ {message}... concluído em %.3fs.", *args, duration)
 
 
-@contextmanager
-def _timed_debug(logger: logging.Logger, message: str):
-    """Context manager para medir e logar o tempo de execução de um bloco de código.
-    Usa nível DEBUG para logging."""
-    logger.debug(f"▶️ {message}...")
-    start_time = time.perf_counter()
-    try:
-        yield
-        end_time = time.perf_counter()
-        duration = end_time - start_time
-        logger.debug(f"✅ {message}... concluído em {duration:.3f}s.")
-    except Exception:
-        logger.error(f"❌ {message}... FALHOU.", exc_info=True)
-        raise
+def _timed(logger: logging.Logger, message: str, *args):
+    """_timed_at no nível INFO."""
+    return _timed_at(logger, logging.INFO, message, *args)
+
+
+def _timed_debug(logger: logging.Logger, message: str, *args):
+    """_timed_at no nível DEBUG."""
+    return _timed_at(logger, logging.DEBUG, message, *args)
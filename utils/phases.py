@@ -0,0 +1,21 @@
+"""
+Cronograma de Req_in compartilhado pelos modelos (COPASI, Tellurium,
+SciPy/Numba e Gillespie): os eventos, os fins de fase e os marcadores dos
+gráficos são todos gerados a partir de PHASES.
+"""
+
+# Cronograma de Req_in: (t_inicio, t_fim, valor)
+PHASES = [(0, 10, 0.0), (10, 30, 1.0), (30, 50, 0.0), (50, 70, 1.0), (70, 100, 0.0)]
+
+# Instantes em que Req_in muda (início de cada fase após a primeira)
+EVENT_TIMES = [t0 for t0, _, _ in PHASES[1:]]
+
+# Ids dos eventos de Req_in nos modelos (E1..E4)
+EVENT_IDS = [f"E{i}" for i in range(1, len(PHASES))]
+
+
+def antimony_events() -> list[str]:
+    """Eventos E1..E4 em Antimony: Req_in muda no início de cada fase."""
+    return [
+        f"{event_id}: at (time >= {t0}): Req_in = {valor};" for event_id, (t0, _, valor) in zip(EVENT_IDS, PHASES[1:])
+    ]
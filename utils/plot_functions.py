@@ -0,0 +1,48 @@
+import logging
+import os
+
+import matplotlib
+if os.environ.get("HEADLESS") == "1":
+    # Sem interface gráfica (CI/benchmark): só o backend Agg, que salva PNG
+    matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+
+logger = logging.getLogger(__name__)
+
+# Figuras já criadas, por (nrows, ncols, figsize)
+_FIG_CACHE = {}
+
+
+def _get_fig(nrows: int, ncols: int, figsize: tuple):
+    """Retorna (fig, axes) com eixos compartilhando x, reaproveitando a figura
+    da chamada anterior com o mesmo layout (eixos limpos) em vez de criar uma
+    nova. A figura devolvida é sempre a figura atual do pyplot. Se a figura
+    foi fechada, cria outra."""
+    key = (nrows, ncols, figsize)
+    cached = _FIG_CACHE.get(key)
+    if cached is not None and plt.fignum_exists(cached[0].number):
+        fig, axes = cached
+        for ax in fig.axes:
+            ax.clear()
+        fig.suptitle("")
+        # Torna-a a figura atual: tight_layout()/show() agem sobre plt.gcf()
+        plt.figure(fig.number)
+        logger.debug(f"Reaproveitando figura {key}")
+        return fig, axes
+
+    fig, axes = plt.subplots(nrows, ncols, figsize=figsize, sharex=True)
+    _FIG_CACHE[key] = (fig, axes)
+    return fig, axes
+
+
+def _mark_events(ax, eventos):
+    """
+    Marca os instantes de troca de Req_in com linhas verticais.
+
+    Usa um único `vlines` (uma LineCollection) por eixo; deve ser chamado
+    depois de definir o ylim, que é mantido.
+    """
+    ymin, ymax = ax.get_ylim()
+    ax.vlines(eventos, ymin, ymax, colors='gray', linestyles=':', alpha=0.5)
+    ax.set_ylim(ymin, ymax)
@@ -0,0 +1,183 @@
+"""
+Etapa 4 (caminho offline): RHS compilado com Numba + SciPy
+==========================================================
+
+Tradução manual do modelo Antimony de `utils/PySB_hand_shake.py`
+(reações J1..J11) para um sistema de 4 EDOs integrado com
+`scipy.integrate.solve_ivp` (LSODA), sem passar pelo Tellurium.
+
+- `f(t, y, p)`: lado direito das EDOs, compilado com `@njit`
+- `jac(t, y, p)`: Jacobiana analítica, evita as diferenças finitas do LSODA
+
+Estado y = [mRNA_Req, Req_out, mRNA_Ack, Ack_out]
+Parâmetros p = [Req_in, k_mrna_req_prod, k_mrna_req_deg, k_req_out_transl,
+                k_req_out_deg, k_mrna_ack_prod, k_mrna_ack_deg,
+                k_ack_out_transl, k_ack_out_deg, K_req]
+
+Qualquer mudança nas constantes ou nas reações do modelo Antimony deve ser
+replicada aqui; `tests/test_rhs_handshake.py` compara o resultado com o
+Tellurium e a Jacobiana com diferenças finitas de `f`.
+"""
+
+import logging
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from numba import njit
+from scipy.integrate import solve_ivp
+
+from utils.logger_functions import _timed_debug
+from utils.phases import PHASES, EVENT_TIMES
+
+logger = logging.getLogger(__name__)
+
+SPECIES = ["mRNA_Req", "Req_out", "mRNA_Ack", "Ack_out"]
+Y0 = np.array([0.0, 0.0, 0.0, 1.0])
+
+# Mesmos valores do bloco de parâmetros do modelo Antimony (Req_in é p[0])
+PARAM_NAMES = [
+    "Req_in", "k_mrna_req_prod", "k_mrna_req_deg", "k_req_out_transl",
+    "k_req_out_deg", "k_mrna_ack_prod", "k_mrna_ack_deg", "k_ack_out_transl",
+    "k_ack_out_deg", "K_req",
+]
+PARAMS = np.array([
+    0.0,    # Req_in
+    3.0,    # k_mrna_req_prod
+    2.5,    # k_mrna_req_deg
+    1.5,    # k_req_out_transl
+    1.5,    # k_req_out_deg
+    3.0,    # k_mrna_ack_prod
+    2.5,    # k_mrna_ack_deg
+    1.5,    # k_ack_out_transl
+    25.0,   # k_ack_out_deg
+    0.5,    # K_req
+])
+
+
+@njit(cache=True, fastmath=True)
+def f(t, y, p):
+    """Lado direito das EDOs (J1..J11 agrupadas por espécie)."""
+    mrna_req, req_out, mrna_ack, ack_out = y[0], y[1], y[2], y[3]
+    req_in = p[0]
+
+    req_in2 = req_in * req_in
+    req_out2 = req_out * req_out
+    mrna_ack2 = mrna_ack * mrna_ack
+    ack_out2 = ack_out * ack_out
+    K_req2 = p[9] * p[9]
+
+    dy = np.empty(4)
+    # J1 - J2
+    dy[0] = p[1] * req_in2 / (0.25 + req_in2) - p[2] * mrna_req
+    # J3 - J4
+    dy[1] = p[3] * mrna_req - p[4] * req_out
+    # J5 - J6
+    dy[2] = p[5] * req_out2 / (K_req2 + req_out2) - p[6] * mrna_ack
+    # J7 - J8 - J9 + J10 - J11
+    dy[3] = (p[7] * mrna_ack
+             - p[8] * req_out * ack_out
+             - 3.0 * (mrna_ack2 / (1.0 + mrna_ack2)) * ack_out
+             + 2.5
+             - 5.0 * (ack_out2 / (1.0 + ack_out2)))
+    return dy
+
+
+@njit(cache=True, fastmath=True)
+def jac(t, y, p):
+    """Jacobiana analítica de `f` em relação a y."""
+    req_out, mrna_ack, ack_out = y[1], y[2], y[3]
+
+    req_out2 = req_out * req_out
+    mrna_ack2 = mrna_ack * mrna_ack
+    ack_out2 = ack_out * ack_out
+    K_req2 = p[9] * p[9]
+
+    den_req = K_req2 + req_out2
+    den_mrna_ack = 1.0 + mrna_ack2
+    den_ack = 1.0 + ack_out2
+
+    J = np.zeros((4, 4))
+    J[0, 0] = -p[2]
+
+    J[1, 0] = p[3]
+    J[1, 1] = -p[4]
+
+    J[2, 1] = p[5] * 2.0 * req_out * K_req2 / (den_req * den_req)
+    J[2, 2] = -p[6]
+
+    J[3, 1] = -p[8] * ack_out
+    J[3, 2] = p[7] - 3.0 * ack_out * 2.0 * mrna_ack / (den_mrna_ack * den_mrna_ack)
+    J[3, 3] = (-p[8] * req_out
+               - 3.0 * mrna_ack2 / den_mrna_ack
+               - 5.0 * 2.0 * ack_out / (den_ack * den_ack))
+    return J
+
+
+@lru_cache(maxsize=16)
+def _integrate_phases(n_points: int, params: tuple) -> tuple:
+    """
+    Integra as 5 fases de Req_in com LSODA usando `f` e `jac`.
+
+    Cada fase é integrada separadamente (Req_in é constante dentro dela) e
+    começa do estado final da anterior. Retorna (tempo, estado) como arrays
+    somente leitura, já que o resultado fica guardado no cache.
+    """
+    with _timed_debug(logger, "Executando simulação SciPy/Numba 5 fases"):
+
+        t_grid = np.linspace(PHASES[0][0], PHASES[-1][1], n_points)
+        p = np.array(params)
+        y = Y0.copy()
+
+        # Buffer único (tempo × espécie) preenchido fase a fase
+        state = np.empty((n_points, len(SPECIES)))
+        inicio = 0
+        for i, (t0, t1, req_in) in enumerate(PHASES):
+            p[0] = req_in
+            ultima = i == len(PHASES) - 1
+            mask = (t_grid >= t0) & ((t_grid <= t1) if ultima else (t_grid < t1))
+            t_eval = np.append(t_grid[mask], t1) if not ultima else t_grid[mask]
+
+            sol = solve_ivp(f, (t0, t1), y, method="LSODA", jac=jac,
+                            t_eval=t_eval, args=(p,))
+            if not sol.success:
+                raise RuntimeError(f"Falha na integração da fase {i + 1}: {sol.message}")
+
+            # O ponto extra em t1 só serve para carregar o estado para a próxima fase
+            n = mask.sum()
+            state[inicio:inicio + n] = sol.y[:, :n].T
+            inicio += n
+            y = sol.y[:, -1]
+
+            logger.info(f"✓ Fase {i + 1} (t={t0}-{t1}, Req_in={req_in:g}): Req_out={y[1]:.4f}, Ack_out={y[3]:.4f}")
+
+        t_grid.flags.writeable = False
+        state.flags.writeable = False
+        return t_grid, state
+
+
+def run_scipy_simulation(n_points: int = 1001, **rates) -> pd.DataFrame:
+    """
+    Simula as 5 fases de Req_in e retorna um DataFrame no mesmo formato de
+    `run_tellurium_simulation`.
+
+    `rates` sobrescreve constantes de PARAMS pelo nome (ex.:
+    `k_ack_out_deg=10.0`). A integração é memorizada por (n_points, parâmetros):
+    chamadas repetidas com os mesmos valores só remontam o DataFrame.
+    """
+    params = PARAMS.copy()
+    for name, value in rates.items():
+        if name not in PARAM_NAMES[1:]:
+            raise ValueError(f"Parâmetro desconhecido: {name!r}")
+        params[PARAM_NAMES.index(name)] = value
+
+    time, state = _integrate_phases(n_points, tuple(params.tolist()))
+
+    data = pd.DataFrame(state.copy(), index=time.copy(), columns=SPECIES)
+    # Índice da fase de cada ponto via searchsorted, sem máscaras booleanas
+    fase = np.searchsorted(EVENT_TIMES, time, side='right')
+    data['Req_in'] = np.array([valor for _, _, valor in PHASES])[fase]
+
+    logger.info(f"✅ Simulação SciPy/Numba 5 fases: {len(data)} pontos")
+
+    return data